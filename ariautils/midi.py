@@ -1,16 +1,21 @@
 """Utils for MIDI processing."""
 
 import re
-import os
-import json
 import hashlib
+import struct
 import copy
+import os
 import unicodedata
 import mido
 
 from mido.midifiles.units import tick2second, second2tick
+from bisect import bisect_left, bisect_right
 from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import accumulate, islice
 from math import log2
+from operator import itemgetter
 from pathlib import Path
 from typing import (
     Any,
@@ -18,10 +23,11 @@ from typing import (
     Deque,
     Concatenate,
     Callable,
+    Iterable,
+    Iterator,
     TypeAlias,
     Literal,
     TypedDict,
-    cast,
 )
 
 from ariautils.utils import (
@@ -32,6 +38,37 @@ from ariautils.utils import (
 
 logger = get_logger(__package__)
 
+# Binary layouts used by MidiDict.calculate_hash
+_COUNT_STRUCT: Final[struct.Struct] = struct.Struct("<q")
+_TEMPO_STRUCT: Final[struct.Struct] = struct.Struct("<qq")
+_PEDAL_STRUCT: Final[struct.Struct] = struct.Struct("<qiii")
+_INSTRUMENT_STRUCT: Final[struct.Struct] = struct.Struct("<qii")
+_NOTE_STRUCT: Final[struct.Struct] = struct.Struct("<qiiqqi")
+
+# Instrument name for each MIDI program, indexed by program number
+_PROGRAM_TO_INSTRUMENT: Final[tuple[str, ...]] = tuple(
+    instrument
+    for instrument in (
+        "piano",
+        "chromatic",
+        "organ",
+        "guitar",
+        "bass",
+        "strings",
+        "ensemble",
+        "brass",
+        "reed",
+        "pipe",
+        "synth_lead",
+        "synth_pad",
+        "synth_effect",
+        "ethnic",
+        "percussive",
+        "sfx",
+    )
+    for _ in range(8)
+)
+
 # TODO:
 # - Remove unneeded comments
 # - Add asserts (e.g., for test and metadata functions)
@@ -132,7 +169,7 @@ class MidiDict:
         self.tempo_msgs = tempo_msgs
         self.pedal_msgs = pedal_msgs
         self.instrument_msgs = instrument_msgs
-        self.note_msgs = sorted(note_msgs, key=lambda msg: msg["tick"])
+        self.note_msgs = sorted(note_msgs, key=itemgetter("tick"))
         self.ticks_per_beat = ticks_per_beat
         self.metadata = metadata
 
@@ -157,32 +194,28 @@ class MidiDict:
             }
             self.instrument_msgs = [DEFAULT_INSTRUMENT_MSG]
 
-        self.program_to_instrument = self.get_program_to_instrument()
+        self.program_to_instrument = _PROGRAM_TO_INSTRUMENT
+
+    @property
+    def present_programs(self) -> frozenset[int]:
+        """The MIDI programs which occur in instrument_msgs."""
+
+        return frozenset(msg["data"] for msg in self.instrument_msgs)
+
+    @property
+    def present_instruments(self) -> frozenset[str]:
+        """The instrument names which occur in instrument_msgs."""
+
+        return frozenset(
+            self.program_to_instrument[msg["data"]]
+            for msg in self.instrument_msgs
+        )
 
     @classmethod
     def get_program_to_instrument(cls) -> dict[int, str]:
         """Return a map of MIDI program to instrument name."""
 
-        PROGRAM_TO_INSTRUMENT: Final[dict[int, str]] = (
-            {i: "piano" for i in range(0, 7 + 1)}
-            | {i: "chromatic" for i in range(8, 15 + 1)}
-            | {i: "organ" for i in range(16, 23 + 1)}
-            | {i: "guitar" for i in range(24, 31 + 1)}
-            | {i: "bass" for i in range(32, 39 + 1)}
-            | {i: "strings" for i in range(40, 47 + 1)}
-            | {i: "ensemble" for i in range(48, 55 + 1)}
-            | {i: "brass" for i in range(56, 63 + 1)}
-            | {i: "reed" for i in range(64, 71 + 1)}
-            | {i: "pipe" for i in range(72, 79 + 1)}
-            | {i: "synth_lead" for i in range(80, 87 + 1)}
-            | {i: "synth_pad" for i in range(88, 95 + 1)}
-            | {i: "synth_effect" for i in range(96, 103 + 1)}
-            | {i: "ethnic" for i in range(104, 111 + 1)}
-            | {i: "percussive" for i in range(112, 119 + 1)}
-            | {i: "sfx" for i in range(120, 127 + 1)}
-        )
-
-        return PROGRAM_TO_INSTRUMENT
+        return dict(enumerate(_PROGRAM_TO_INSTRUMENT))
 
     def get_msg_dict(self) -> MidiDictData:
         """Returns MidiDict data in dictionary form."""
@@ -219,64 +252,185 @@ class MidiDict:
         return cls(**msg_dict)
 
     @classmethod
-    def from_midi(cls, mid_path: str | Path) -> "MidiDict":
-        """Loads a MIDI file from path and returns MidiDict."""
+    def from_midi(
+        cls, mid_path: str | Path, collect_meta_msgs: bool = True
+    ) -> "MidiDict":
+        """Loads a MIDI file from path and returns MidiDict.
+
+        If collect_meta_msgs is False, text and copyright meta messages are
+        not parsed and meta_msgs will be empty.
+        """
 
         mid = mido.MidiFile(mid_path)
-        midi_dict = cls(**midi_to_dict(mid))
+        midi_dict = cls(**midi_to_dict(mid, collect_meta_msgs))
         midi_dict.metadata["abs_load_path"] = str(Path(mid_path).absolute())
 
         return midi_dict
 
     def calculate_hash(self) -> str:
-        msg_dict_to_hash = cast(dict, self.get_msg_dict())
+        # Metadata (meta_msgs, ticks_per_beat, metadata) is not hashed. Each
+        # msg is packed and fed to the digest in turn, so the full payload is
+        # never materialized in memory.
+        h = hashlib.blake2b(digest_size=16)
+
+        h.update(_COUNT_STRUCT.pack(len(self.tempo_msgs)))
+        for tempo_msg in self.tempo_msgs:
+            h.update(_TEMPO_STRUCT.pack(tempo_msg["tick"], tempo_msg["data"]))
+
+        h.update(_COUNT_STRUCT.pack(len(self.pedal_msgs)))
+        for pedal_msg in self.pedal_msgs:
+            h.update(
+                _PEDAL_STRUCT.pack(
+                    pedal_msg["tick"],
+                    pedal_msg["channel"],
+                    pedal_msg["data"],
+                    pedal_msg["value"],
+                )
+            )
+
+        h.update(_COUNT_STRUCT.pack(len(self.instrument_msgs)))
+        for instrument_msg in self.instrument_msgs:
+            h.update(
+                _INSTRUMENT_STRUCT.pack(
+                    instrument_msg["tick"],
+                    instrument_msg["channel"],
+                    instrument_msg["data"],
+                )
+            )
+
+        h.update(_COUNT_STRUCT.pack(len(self.note_msgs)))
+        for note_msg in self.note_msgs:
+            note_data = note_msg["data"]
+            h.update(
+                _NOTE_STRUCT.pack(
+                    note_msg["tick"],
+                    note_msg["channel"],
+                    note_data["pitch"],
+                    note_data["start"],
+                    note_data["end"],
+                    note_data["velocity"],
+                )
+            )
 
-        # Remove metadata before calculating hash
-        msg_dict_to_hash.pop("meta_msgs")
-        msg_dict_to_hash.pop("ticks_per_beat")
-        msg_dict_to_hash.pop("metadata")
+        return h.hexdigest()
 
-        return hashlib.md5(
-            json.dumps(msg_dict_to_hash, sort_keys=True).encode()
-        ).hexdigest()
+    def _build_tempo_index(self) -> tuple[list[int], list[float], list[float]]:
+        """Precomputes the elapsed time (in seconds) at each tempo change.
+
+        Returns the tick at which each tempo segment starts, the seconds per
+        tick in each segment, and the seconds elapsed at the start of each
+        segment. The first segment always starts at tick 0.
+        """
+
+        tempo_ticks = [0] + [msg["tick"] for msg in self.tempo_msgs[1:]]
+        tempo_scales = [
+            msg["data"] * 1e-6 / self.ticks_per_beat for msg in self.tempo_msgs
+        ]
+
+        # Accumulated in the same order as get_duration_ms, so that results
+        # are identical
+        elapsed_s = [0.0]
+        for idx in range(len(tempo_ticks) - 1):
+            elapsed_s.append(
+                elapsed_s[-1]
+                + (tempo_ticks[idx + 1] - tempo_ticks[idx]) * tempo_scales[idx]
+            )
+
+        return tempo_ticks, tempo_scales, elapsed_s
+
+    def get_tick_to_ms_fn(self) -> Callable[[int], int]:
+        """Returns a function equivalent to tick_to_ms for the current tempos.
+
+        The cumulative time at each tempo change is computed once, so each
+        call of the returned function only requires a binary search over the
+        tempo changes. Use this when converting many ticks. The returned
+        function does not reflect later changes to tempo_msgs or
+        ticks_per_beat.
+        """
+
+        tempo_ticks, tempo_scales, elapsed_s = self._build_tempo_index()
+        last_idx = len(tempo_ticks) - 1
+        last_tempo_tick = self.tempo_msgs[-1]["tick"]
+
+        def _tick_to_ms(tick: int) -> int:
+            idx = max(bisect_right(tempo_ticks, tick) - 1, 0)
+            if idx == last_idx and tick <= last_tempo_tick:
+                # Consistent with get_duration_ms, which ignores the final
+                # tempo segment until tick is past the final tempo msg
+                duration = elapsed_s[idx]
+            else:
+                duration = (
+                    elapsed_s[idx]
+                    + (tick - tempo_ticks[idx]) * tempo_scales[idx]
+                )
+
+            return round(duration * 1e3)
+
+        return _tick_to_ms
 
     def tick_to_ms(self, tick: int) -> int:
-        """Calculate the time (in milliseconds) in current file at a MIDI tick."""
+        """Calculate the time (in milliseconds) in current file at a MIDI tick.
+
+        Equivalent to get_duration_ms with start_tick=0. When converting many
+        ticks, use get_tick_to_ms_fn instead.
+        """
+
+        return self.get_tick_to_ms_fn()(tick)
+
+    def duration_ms_between(self, start_tick: int, end_tick: int) -> int:
+        """Calculate the duration (in milliseconds) between two MIDI ticks.
+
+        Equivalent to calling get_duration_ms with the tempo_msgs and
+        ticks_per_beat of this MidiDict.
+        """
 
         return get_duration_ms(
-            start_tick=0,
-            end_tick=tick,
+            start_tick=start_tick,
+            end_tick=end_tick,
             tempo_msgs=self.tempo_msgs,
             ticks_per_beat=self.ticks_per_beat,
         )
 
+    def _get_note_msgs_by_channel(self) -> dict[int, list[NoteMessage]]:
+        """Returns a mapping of channels to note messages, in a single pass."""
+
+        note_msgs_by_channel: dict[int, list[NoteMessage]] = defaultdict(list)
+        for msg in self.note_msgs:
+            note_msgs_by_channel[msg["channel"]].append(msg)
+
+        return note_msgs_by_channel
+
     def _build_pedal_intervals(self) -> dict[int, list[list[int]]]:
         """Returns a mapping of channels to sustain pedal intervals."""
 
-        self.pedal_msgs.sort(key=lambda msg: msg["tick"])
+        self.pedal_msgs.sort(key=itemgetter("tick"))
         channel_to_pedal_intervals = defaultdict(list)
-        pedal_status: dict[int, int] = {}
+        # Tick at which the pedal went down on each MIDI channel, or -1 if the
+        # pedal is up
+        pedal_status = [-1] * 16
 
         for pedal_msg in self.pedal_msgs:
-            tick = pedal_msg["tick"]
             channel = pedal_msg["channel"]
             data = pedal_msg["data"]
+            start_tick = pedal_status[channel]
 
-            if data == 1 and pedal_status.get(channel, None) is None:
-                pedal_status[channel] = tick
-            elif data == 0 and pedal_status.get(channel, None) is not None:
+            if data == 1:
+                if start_tick < 0:
+                    pedal_status[channel] = pedal_msg["tick"]
+            elif data == 0 and start_tick >= 0:
                 # Close pedal interval
-                _start_tick = pedal_status[channel]
-                _end_tick = tick
                 channel_to_pedal_intervals[channel].append(
-                    [_start_tick, _end_tick]
+                    [start_tick, pedal_msg["tick"]]
                 )
-                del pedal_status[channel]
+                pedal_status[channel] = -1
 
         # Close all unclosed pedals at end of track
         final_tick = self.note_msgs[-1]["data"]["end"]
-        for channel, start_tick in pedal_status.items():
-            channel_to_pedal_intervals[channel].append([start_tick, final_tick])
+        for channel, start_tick in enumerate(pedal_status):
+            if start_tick >= 0:
+                channel_to_pedal_intervals[channel].append(
+                    [start_tick, final_tick]
+                )
 
         return channel_to_pedal_intervals
 
@@ -293,29 +447,22 @@ class MidiDict:
         modified, e.g., by resolve_overlap().
         """
 
-        # Organize notes by channel and pitch
-        note_msgs_c: dict[int, dict[int, list[NoteMessage]]] = defaultdict(
-            lambda: defaultdict(list)
-        )
+        # Organize note data by channel and pitch. We can modify notes by
+        # reference as they are dictionaries.
+        note_data_c: dict[tuple[int, int], list[NoteData]] = defaultdict(list)
         for msg in self.note_msgs:
-            _channel = msg["channel"]
-            _pitch = msg["data"]["pitch"]
-            note_msgs_c[_channel][_pitch].append(msg)
-
-        # We can modify notes by reference as they are dictionaries
-        for channel, msgs_by_pitch in note_msgs_c.items():
-            for pitch, msgs in msgs_by_pitch.items():
-                msgs.sort(
-                    key=lambda msg: (msg["data"]["start"], msg["data"]["end"])
-                )
-                prev_off_tick = -1
-                for idx, msg in enumerate(msgs):
-                    on_tick = msg["data"]["start"]
-                    off_tick = msg["data"]["end"]
-                    if prev_off_tick > on_tick:
-                        # Adjust end of previous (idx - 1) msg to remove overlap
-                        msgs[idx - 1]["data"]["end"] = on_tick
-                    prev_off_tick = off_tick
+            data = msg["data"]
+            note_data_c[(msg["channel"], data["pitch"])].append(data)
+
+        for note_data in note_data_c.values():
+            if len(note_data) < 2:
+                continue
+
+            note_data.sort(key=lambda data: (data["start"], data["end"]))
+            for prev_data, data in zip(note_data, note_data[1:]):
+                if prev_data["end"] > data["start"]:
+                    # Adjust end of previous msg to remove overlap
+                    prev_data["end"] = data["start"]
 
         return self
 
@@ -352,11 +499,12 @@ class MidiDict:
             key = (msg["channel"], msg["data"]["pitch"])
             note_groups[key].append(msg)
 
+        tick_to_ms = self.get_tick_to_ms_fn()
         for msgs in note_groups.values():
             msgs.sort(key=lambda m: m["data"]["start"])
             for prev, curr in zip(msgs, msgs[1:]):
-                prev_end_ms = self.tick_to_ms(prev["data"]["end"])
-                curr_start_ms = self.tick_to_ms(curr["data"]["start"])
+                prev_end_ms = tick_to_ms(prev["data"]["end"])
+                curr_start_ms = tick_to_ms(curr["data"]["start"])
                 curr_gap_ms = curr_start_ms - prev_end_ms
                 if curr_gap_ms < min_gap_ms:
                     # Compute new end so that curr_start_ms - new_end_ms == min_gap_ms
@@ -373,8 +521,9 @@ class MidiDict:
 
         filtered = []
         for msg in self.note_msgs:
-            start_ms = self.tick_to_ms(msg["data"]["start"])
-            end_ms = self.tick_to_ms(msg["data"]["end"])
+            data = msg["data"]
+            start_ms = tick_to_ms(data["start"])
+            end_ms = tick_to_ms(data["end"])
             if end_ms - start_ms >= min_length_ms:
                 filtered.append(msg)
 
@@ -424,29 +573,34 @@ class MidiDict:
         if self.pedal_resolved:
             print("Pedal has already been resolved")
 
-        # Organize note messages by channel
-        note_msgs_c = defaultdict(list)
-        for msg in self.note_msgs:
-            _channel = msg["channel"]
-            note_msgs_c[_channel].append(msg)
+        note_msgs_c = self._get_note_msgs_by_channel()
 
-        # We can modify notes by reference as they are dictionaries
+        # We can modify notes by reference as they are dictionaries. Pedal
+        # intervals on a channel are disjoint and ordered, so the only interval
+        # which can contain a note end is the last one starting before it.
         channel_to_pedal_intervals = self._build_pedal_intervals()
         for channel, msgs in note_msgs_c.items():
+            pedal_intervals = channel_to_pedal_intervals[channel]
+            if not pedal_intervals:
+                continue
+
+            pedal_starts = [pedal_start for pedal_start, _ in pedal_intervals]
             for msg in msgs:
-                note_end_tick = msg["data"]["end"]
-                for pedal_interval in channel_to_pedal_intervals[channel]:
-                    pedal_start, pedal_end = pedal_interval
-                    if pedal_start < note_end_tick < pedal_end:
-                        msg["data"]["end"] = pedal_end
-                        break
+                data = msg["data"]
+                note_end_tick = data["end"]
+                idx = bisect_left(pedal_starts, note_end_tick) - 1
+                if idx < 0:
+                    continue
+
+                pedal_end = pedal_intervals[idx][1]
+                if note_end_tick < pedal_end:
+                    data["end"] = pedal_end
 
         self.resolve_overlaps()
         self.pedal_resolved = True
 
         return self
 
-    # TODO: Needs to be refactored
     def remove_redundant_pedals(self) -> "MidiDict":
         """Removes redundant pedal messages from the MIDI data in place.
 
@@ -458,80 +612,53 @@ class MidiDict:
         def _is_pedal_useful(
             pedal_start_tick: int,
             pedal_end_tick: int,
-            note_msgs: list[NoteMessage],
+            note_end_ticks: list[int],
         ) -> bool:
-            # This logic loops through the note_msgs that could possibly
-            # be effected by the pedal which starts at pedal_start_tick
-            # and ends at pedal_end_tick. If there is note effected by the
-            # pedal, then it returns early.
-
-            note_idx = 0
-            note_msg = note_msgs[0]
-            note_start = note_msg["data"]["start"]
-
-            while note_start <= pedal_end_tick and note_idx < len(note_msgs):
-                note_msg = note_msgs[note_idx]
-                note_start, note_end = (
-                    note_msg["data"]["start"],
-                    note_msg["data"]["end"],
-                )
+            # The pedal is useful if it effects at least one note, i.e., if
+            # a note ends in (pedal_start_tick, pedal_end_tick]. As
+            # note_end_ticks is sorted, we can jump straight to the first
+            # note ending after pedal_start_tick.
 
-                if pedal_start_tick < note_end <= pedal_end_tick:
-                    # Found note for which pedal is useful
-                    return True
+            idx = bisect_right(note_end_ticks, pedal_start_tick)
 
-                note_idx += 1
-
-            return False
+            return (
+                idx < len(note_end_ticks)
+                and note_end_ticks[idx] <= pedal_end_tick
+            )
 
-        def _process_channel_pedals(channel: int) -> None:
-            pedal_msg_idxs_to_remove = set()
+        def _process_channel_pedals(
+            pedal_msg_idxs: list[int],
+            note_msgs: list[NoteMessage],
+        ) -> None:
             pedal_down_tick = None
             pedal_down_msg_idx = None
 
-            note_msgs = [
-                msg for msg in self.note_msgs if msg["channel"] == channel
-            ]
-
             if not note_msgs:
                 # No notes to process. In this case we remove all pedal_msgs
                 # and then return early.
-                for pedal_msg_idx, pedal_msg in enumerate(self.pedal_msgs):
-                    pedal_msg_value, pedal_msg_tick, _channel = (
-                        pedal_msg["data"],
-                        pedal_msg["tick"],
-                        pedal_msg["channel"],
-                    )
+                for pedal_msg_idx in pedal_msg_idxs:
+                    keep[pedal_msg_idx] = 0
+                return
 
-                    if _channel == channel:
-                        pedal_msg_idxs_to_remove.add(pedal_msg_idx)
+            note_end_ticks = sorted(msg["data"]["end"] for msg in note_msgs)
 
-                # Remove messages
-                self.pedal_msgs = [
-                    msg
-                    for _idx, msg in enumerate(self.pedal_msgs)
-                    if _idx not in pedal_msg_idxs_to_remove
-                ]
-                return
+            # Index of the last pedal msg which has not been removed by
+            # previously processed channels
+            last_pedal_msg_idx = len(keep) - 1
+            while last_pedal_msg_idx >= 0 and not keep[last_pedal_msg_idx]:
+                last_pedal_msg_idx -= 1
 
-            for pedal_msg_idx, pedal_msg in enumerate(self.pedal_msgs):
-                pedal_msg_value, pedal_msg_tick, _channel = (
+            for pedal_msg_idx in pedal_msg_idxs:
+                pedal_msg = self.pedal_msgs[pedal_msg_idx]
+                pedal_msg_value, pedal_msg_tick = (
                     pedal_msg["data"],
                     pedal_msg["tick"],
-                    pedal_msg["channel"],
                 )
 
-                # Only process pedal_msgs for specified MIDI channel
-                if _channel != channel:
-                    continue
-
                 # Remove never-closed pedal messages
-                if (
-                    pedal_msg_idx == len(self.pedal_msgs) - 1
-                    and pedal_msg_value == 1
-                ):
+                if pedal_msg_idx == last_pedal_msg_idx and pedal_msg_value == 1:
                     # Current msg is last one and ON  -> remove curr pedal_msg
-                    pedal_msg_idxs_to_remove.add(pedal_msg_idx)
+                    keep[pedal_msg_idx] = 0
 
                 # Logic for removing repeated pedal messages and updating
                 # pedal_down_tick and pedal_down_idx
@@ -543,39 +670,50 @@ class MidiDict:
                         continue
                     else:
                         # Pedal is OFF and current msg is OFF -> remove curr pedal_msg
-                        pedal_msg_idxs_to_remove.add(pedal_msg_idx)
+                        keep[pedal_msg_idx] = 0
                         continue
                 else:
                     if pedal_msg_value == 1:
                         # Pedal is ON and current msg is ON -> remove curr pedal_msg
-                        pedal_msg_idxs_to_remove.add(pedal_msg_idx)
+                        keep[pedal_msg_idx] = 0
                         continue
 
                 pedal_is_useful = _is_pedal_useful(
                     pedal_start_tick=pedal_down_tick,
                     pedal_end_tick=pedal_msg_tick,
-                    note_msgs=note_msgs,
+                    note_end_ticks=note_end_ticks,
                 )
 
                 if pedal_is_useful is False:
                     # Pedal hasn't effected any notes -> remove
                     assert pedal_down_msg_idx is not None
-                    pedal_msg_idxs_to_remove.add(pedal_down_msg_idx)  # line 517
-                    pedal_msg_idxs_to_remove.add(pedal_msg_idx)
+                    keep[pedal_down_msg_idx] = 0
+                    keep[pedal_msg_idx] = 0
 
                 # Finished processing pedal, set pedal state to OFF
                 pedal_down_tick = None
                 pedal_down_msg_idx = None
 
-            # Remove messages
-            self.pedal_msgs = [
-                msg
-                for _idx, msg in enumerate(self.pedal_msgs)
-                if _idx not in pedal_msg_idxs_to_remove
-            ]
+        # Pedal msgs are removed at the end according to this mask
+        keep = bytearray(b"\x01" * len(self.pedal_msgs))
 
-        for channel in set([msg["channel"] for msg in self.pedal_msgs]):
-            _process_channel_pedals(channel)
+        pedal_msg_idxs_by_channel: dict[int, list[int]] = defaultdict(list)
+        for pedal_msg_idx, pedal_msg in enumerate(self.pedal_msgs):
+            pedal_msg_idxs_by_channel[pedal_msg["channel"]].append(
+                pedal_msg_idx
+            )
+
+        notes_by_channel = self._get_note_msgs_by_channel()
+
+        for channel in {msg["channel"] for msg in self.pedal_msgs}:
+            _process_channel_pedals(
+                pedal_msg_idxs=pedal_msg_idxs_by_channel[channel],
+                note_msgs=notes_by_channel[channel],
+            )
+
+        self.pedal_msgs = [
+            msg for msg, _keep in zip(self.pedal_msgs, keep) if _keep
+        ]
 
         return self
 
@@ -588,11 +726,11 @@ class MidiDict:
         are not removed.
         """
 
-        programs_to_remove = [
+        programs_to_remove = {
             i
             for i in range(1, 127 + 1)
-            if remove_instruments[self.program_to_instrument[i]] is True
-        ]
+            if remove_instruments[_PROGRAM_TO_INSTRUMENT[i]] is True
+        }
         channels_to_remove = [
             msg["channel"]
             for msg in self.instrument_msgs
@@ -625,9 +763,9 @@ class MidiDict:
         return self
 
 
-# TODO: The sign has been changed. Make sure this function isn't used anywhere else
 def _extract_track_data(
     track: mido.MidiTrack,
+    collect_meta_msgs: bool = True,
 ) -> tuple[
     list[MetaMessage],
     list[TempoMessage],
@@ -635,7 +773,11 @@ def _extract_track_data(
     list[InstrumentMessage],
     list[NoteMessage],
 ]:
-    """Converts MIDI messages into format used by MidiDict."""
+    """Converts MIDI messages into format used by MidiDict.
+
+    Message times in track are expected to be relative (delta) ticks, as in
+    mido. Absolute ticks are computed on the fly so that track is not modified.
+    """
 
     meta_msgs: list[MetaMessage] = []
     tempo_msgs: list[TempoMessage] = []
@@ -643,73 +785,34 @@ def _extract_track_data(
     instrument_msgs: list[InstrumentMessage] = []
     note_msgs: list[NoteMessage] = []
 
-    last_note_on = defaultdict(list)
-    for message in track:
-        # Meta messages
-        if message.is_meta is True:
-            if message.type == "text" or message.type == "copyright":
-                meta_msgs.append(
-                    {
-                        "type": message.type,
-                        "data": message.text,
-                    }
-                )
-            # Tempo messages
-            elif message.type == "set_tempo":
-                tempo_msgs.append(
-                    {
-                        "type": "tempo",
-                        "data": message.tempo,
-                        "tick": message.time,
-                    }
-                )
-        # Instrument messages
-        elif message.type == "program_change":
-            instrument_msgs.append(
-                {
-                    "type": "instrument",
-                    "data": message.program,
-                    "tick": message.time,
-                    "channel": message.channel,
-                }
-            )
-        # Pedal messages
-        elif message.type == "control_change" and message.control == 64:
-            # Consistent with pretty_midi and ableton-live default behavior
-            pedal_msgs.append(
-                {
-                    "type": "pedal",
-                    "data": 0 if message.value < 64 else 1,
-                    "value": message.value,
-                    "tick": message.time,
-                    "channel": message.channel,
-                }
-            )
+    # Note messages are by far the most common, so they are checked first
+    last_note_on: dict[tuple[int, int], list[tuple[int, int]]] = {}
+    for message, tick in zip(
+        track, accumulate(message.time for message in track)
+    ):
+        msg_type = message.type
+
         # Note messages
-        elif message.type == "note_on" and message.velocity > 0:
-            last_note_on[(message.note, message.channel)].append(
-                (message.time, message.velocity)
-            )
-        elif message.type == "note_off" or (
-            message.type == "note_on" and message.velocity == 0
-        ):
+        if msg_type == "note_on" and message.velocity > 0:
+            key = (message.note, message.channel)
+            open_notes = last_note_on.get(key)
+            if open_notes is None:
+                last_note_on[key] = [(tick, message.velocity)]
+            else:
+                open_notes.append((tick, message.velocity))
+        elif msg_type == "note_off" or msg_type == "note_on":
             # Ignore non-existent note-ons
-            if (message.note, message.channel) in last_note_on:
-                end_tick = message.time
-                open_notes = last_note_on[(message.note, message.channel)]
-
-                notes_to_close = [
-                    (start_tick, velocity)
-                    for start_tick, velocity in open_notes
-                    if start_tick != end_tick
-                ]
-                notes_to_keep = [
-                    (start_tick, velocity)
-                    for start_tick, velocity in open_notes
-                    if start_tick == end_tick
-                ]
-
-                for start_tick, velocity in notes_to_close:
+            key = (message.note, message.channel)
+            open_notes = last_note_on.get(key)
+            if open_notes is None:
+                continue
+
+            end_tick = tick
+            notes_to_keep = []
+            for start_tick, velocity in open_notes:
+                if start_tick == end_tick:
+                    notes_to_keep.append((start_tick, velocity))
+                else:
                     note_msgs.append(
                         {
                             "type": "note",
@@ -724,20 +827,62 @@ def _extract_track_data(
                         }
                     )
 
-                if len(notes_to_close) > 0 and len(notes_to_keep) > 0:
-                    # Note-on on the same tick but we already closed
-                    # some previous notes -> it will continue, keep it.
-                    last_note_on[(message.note, message.channel)] = (
-                        notes_to_keep
-                    )
-                else:
-                    # Remove the last note on for this instrument
-                    del last_note_on[(message.note, message.channel)]
+            if notes_to_keep and len(notes_to_keep) < len(open_notes):
+                # Note-on on the same tick but we already closed
+                # some previous notes -> it will continue, keep it.
+                last_note_on[key] = notes_to_keep
+            else:
+                # Remove the last note on for this instrument
+                del last_note_on[key]
+        # Pedal messages
+        elif msg_type == "control_change":
+            if message.control == 64:
+                # Consistent with pretty_midi and ableton-live default behavior
+                pedal_msgs.append(
+                    {
+                        "type": "pedal",
+                        "data": 0 if message.value < 64 else 1,
+                        "value": message.value,
+                        "tick": tick,
+                        "channel": message.channel,
+                    }
+                )
+        # Instrument messages
+        elif msg_type == "program_change":
+            instrument_msgs.append(
+                {
+                    "type": "instrument",
+                    "data": message.program,
+                    "tick": tick,
+                    "channel": message.channel,
+                }
+            )
+        # Meta messages
+        elif collect_meta_msgs and (
+            msg_type == "text" or msg_type == "copyright"
+        ):
+            meta_msgs.append(
+                {
+                    "type": msg_type,
+                    "data": message.text,
+                }
+            )
+        # Tempo messages
+        elif msg_type == "set_tempo":
+            tempo_msgs.append(
+                {
+                    "type": "tempo",
+                    "data": message.tempo,
+                    "tick": tick,
+                }
+            )
 
     return meta_msgs, tempo_msgs, pedal_msgs, instrument_msgs, note_msgs
 
 
-def midi_to_dict(mid: mido.MidiFile) -> MidiDictData:
+def midi_to_dict(
+    mid: mido.MidiFile, collect_meta_msgs: bool = True
+) -> MidiDictData:
     """Converts mid.MidiFile into MidiDictData representation.
 
     Additionally runs metadata extraction according to config specified at:
@@ -746,21 +891,15 @@ def midi_to_dict(mid: mido.MidiFile) -> MidiDictData:
 
     Args:
         mid (mido.MidiFile): A mido file object to parse.
+        collect_meta_msgs (bool): Whether to collect text and copyright meta
+            messages. These are only needed for metadata extraction (e.g.,
+            meta_composer_metamsg), so can be skipped otherwise.
 
     Returns:
         MidiDictData: A dictionary containing extracted MIDI data including notes,
             time signatures, key signatures, and other musical events.
     """
 
-    mid = copy.deepcopy(mid)
-
-    # Convert time in mid to absolute
-    for track in mid.tracks:
-        curr_tick = 0
-        for message in track:
-            message.time += curr_tick
-            curr_tick = message.time
-
     midi_dict_data: MidiDictData = {
         "meta_msgs": [],
         "tempo_msgs": [],
@@ -774,7 +913,7 @@ def midi_to_dict(mid: mido.MidiFile) -> MidiDictData:
     # Compile track data
     for mid_track in mid.tracks:
         meta_msgs, tempo_msgs, pedal_msgs, instrument_msgs, note_msgs = (
-            _extract_track_data(mid_track)
+            _extract_track_data(mid_track, collect_meta_msgs)
         )
         midi_dict_data["meta_msgs"] += meta_msgs
         midi_dict_data["tempo_msgs"] += tempo_msgs
@@ -783,18 +922,11 @@ def midi_to_dict(mid: mido.MidiFile) -> MidiDictData:
         midi_dict_data["note_msgs"] += note_msgs
 
     # Sort by tick (for note msgs, this will be the same as data.start_tick)
-    midi_dict_data["tempo_msgs"] = sorted(
-        midi_dict_data["tempo_msgs"], key=lambda x: x["tick"]
-    )
-    midi_dict_data["pedal_msgs"] = sorted(
-        midi_dict_data["pedal_msgs"], key=lambda x: x["tick"]
-    )
-    midi_dict_data["instrument_msgs"] = sorted(
-        midi_dict_data["instrument_msgs"], key=lambda x: x["tick"]
-    )
-    midi_dict_data["note_msgs"] = sorted(
-        midi_dict_data["note_msgs"], key=lambda x: x["tick"]
-    )
+    get_tick = itemgetter("tick")
+    midi_dict_data["tempo_msgs"].sort(key=get_tick)
+    midi_dict_data["pedal_msgs"].sort(key=get_tick)
+    midi_dict_data["instrument_msgs"].sort(key=get_tick)
+    midi_dict_data["note_msgs"].sort(key=get_tick)
 
     return midi_dict_data
 
@@ -859,31 +991,35 @@ def dict_to_midi(mid_data: MidiDictData) -> mido.MidiFile:
         )
 
     for note_msg in mid_data["note_msgs"]:
+        note_data = note_msg["data"]
+        channel = note_msg["channel"]
         # Note on
         track.append(
             mido.Message(
                 "note_on",
-                note=note_msg["data"]["pitch"],
-                velocity=note_msg["data"]["velocity"],
-                channel=note_msg["channel"],
-                time=note_msg["data"]["start"],
+                note=note_data["pitch"],
+                velocity=note_data["velocity"],
+                channel=channel,
+                time=note_data["start"],
             )
         )
         # Note off
-        end_msgs[(note_msg["channel"], note_msg["data"]["pitch"])].append(
-            (note_msg["data"]["start"], note_msg["data"]["end"])
+        end_msgs[(channel, note_data["pitch"])].append(
+            (note_data["start"], note_data["end"])
         )
 
-    # Only add end messages that don't interfere with other notes
+    # Only add end messages that don't interfere with other notes, i.e., skip
+    # the end of [start, end] if a note with the same channel and pitch starts
+    # inside (start, end) and ends after end. Sorting by start lets us find
+    # these candidate notes by bisection.
     for k, v in end_msgs.items():
         channel, pitch = k
+        v.sort()
+        starts = [start for start, _ in v]
         for start, end in v:
-            add = True
-            for _start, _end in v:
-                if start < _start < end < _end:
-                    add = False
-
-            if add is True:
+            lo = bisect_right(starts, start)
+            hi = bisect_left(starts, end, lo)
+            if all(v[idx][1] <= end for idx in range(lo, hi)):
                 track.append(
                     mido.Message(
                         "note_on",
@@ -924,9 +1060,9 @@ def get_duration_ms(
 
     # Finds idx such that:
     # tempo_msg[idx]["tick"] < start_tick <= tempo_msg[idx+1]["tick"]
-    for idx, curr_msg in enumerate(tempo_msgs):
-        if start_tick <= curr_msg["tick"]:
-            break
+    idx = bisect_left(tempo_msgs, start_tick, key=itemgetter("tick"))
+    if idx == len(tempo_msgs):  # Special case start_tick > all tempo ticks
+        idx -= 1
     if idx > 0:  # Special case idx == 0 -> Don't -1
         idx -= 1
 
@@ -973,31 +1109,61 @@ def get_duration_ms(
     return duration
 
 
-def _match_word(text: str, word: str) -> bool:
-    def to_ascii(s: str) -> str:
-        # Remove accents
-        normalized = unicodedata.normalize("NFKD", s)
-        return "".join(c for c in normalized if not unicodedata.combining(c))
-
-    text = to_ascii(text)
-    word = to_ascii(word)
-
-    # If name="bach" this pattern will match "bach", "Bach" or "BACH" if
-    # it is either proceeded or preceded by a "_" or " ".
-    pattern = (
-        r"(^|[\s_])("
-        + word.lower()
-        + r"|"
-        + word.upper()
-        + r"|"
-        + word.capitalize()
-        + r")([\s_]|$)"
+def _to_ascii(s: str) -> str:
+    # Remove accents
+    if s.isascii():
+        return s
+
+    normalized = unicodedata.normalize("NFKD", s)
+    return "".join([c for c in normalized if not unicodedata.combining(c)])
+
+
+@lru_cache(maxsize=64)
+def _compile_names_pattern(names: tuple[str, ...]) -> re.Pattern[str]:
+    # If names=("bach",) this pattern will match "bach", "Bach" or "BACH" if
+    # it is both proceeded and followed by a "_", whitespace, or the start/end
+    # of the text. Every name gets its own optional capture group inside a
+    # lookahead, so that names matching at the same position, e.g., "bach"
+    # and "bach family", are all reported by a single scan of the text.
+    escaped_names = [re.escape(_to_ascii(name)) for name in names]
+    return re.compile(
+        r"(?<![^\s_])(?=(?:"
+        + "|".join(escaped_names)
+        + r")(?![^\s_]))"
+        + "".join(
+            r"(?=(?:(" + escaped_name + r")(?![^\s_]))?)"
+            for escaped_name in escaped_names
+        ),
+        re.IGNORECASE,
     )
 
-    if re.search(pattern, text, re.IGNORECASE):
-        return True
-    else:
-        return False
+
+def _match_names(text: str, names: tuple[str, ...]) -> frozenset[str]:
+    """Returns the subset of names which occur as words in text.
+
+    Callers only need to know whether a single name was matched, so the scan
+    stops as soon as two distinct names have been found. In that case the
+    result contains at least two, but not necessarily all, matching names.
+    """
+    if not names:
+        return frozenset()
+
+    matched_names = set()
+    for match in _compile_names_pattern(names).finditer(_to_ascii(text)):
+        for name, group in zip(names, match.groups()):
+            if group is not None:
+                matched_names.add(name)
+
+        if len(matched_names) > 1:
+            break
+
+    return frozenset(matched_names)
+
+
+# MAESTRO title and composer strings repeat verbatim across files, so matches
+# against them are memoized. File names and joined meta msgs are (nearly)
+# unique to each file, so they are matched with the uncached _match_names.
+_match_names_cached = lru_cache(maxsize=4096)(_match_names)
 
 
 def meta_composer_filename(
@@ -1008,15 +1174,12 @@ def meta_composer_filename(
         return {}
 
     file_name = Path(abs_load_path).stem
-    matched_names_unique = set()
-    for name in composer_names:
-        if _match_word(file_name, name):
-            matched_names_unique.add(name)
+    matched_names_unique = _match_names(file_name, tuple(composer_names))
 
     # Only return data if only one composer is found
-    matched_names = list(matched_names_unique)
-    if len(matched_names) == 1:
-        return {"composer": matched_names[0]}
+    if len(matched_names_unique) == 1:
+        (composer,) = matched_names_unique
+        return {"composer": composer}
     else:
         return {}
 
@@ -1027,15 +1190,12 @@ def meta_form_filename(midi_dict: MidiDict, form_names: list) -> dict[str, str]:
         return {}
 
     file_name = Path(abs_load_path).stem
-    matched_names_unique = set()
-    for name in form_names:
-        if _match_word(file_name, name):
-            matched_names_unique.add(name)
+    matched_names_unique = _match_names(file_name, tuple(form_names))
 
     # Only return data if only one composer is found
-    matched_names = list(matched_names_unique)
-    if len(matched_names) == 1:
-        return {"form": matched_names[0]}
+    if len(matched_names_unique) == 1:
+        (form,) = matched_names_unique
+        return {"form": form}
     else:
         return {}
 
@@ -1043,16 +1203,17 @@ def meta_form_filename(midi_dict: MidiDict, form_names: list) -> dict[str, str]:
 def meta_composer_metamsg(
     midi_dict: MidiDict, composer_names: list
 ) -> dict[str, str]:
-    matched_names_unique = set()
-    for msg in midi_dict.meta_msgs:
-        for name in composer_names:
-            if _match_word(msg["data"], name):
-                matched_names_unique.add(name)
+    if not midi_dict.meta_msgs:
+        return {}
+
+    # Newlines count as word boundaries, so names can't match across messages
+    meta_text = "\n".join(msg["data"] for msg in midi_dict.meta_msgs)
+    matched_names_unique = _match_names(meta_text, tuple(composer_names))
 
     # Only return data if only one composer is found
-    matched_names = list(matched_names_unique)
-    if len(matched_names) == 1:
-        return {"composer": matched_names[0]}
+    if len(matched_names_unique) == 1:
+        (composer,) = matched_names_unique
+        return {"composer": composer}
     else:
         return {}
 
@@ -1080,23 +1241,18 @@ def meta_maestro_json(
     if metadata is None:
         return {}
 
-    matched_forms_unique = set()
-    for form in form_names:
-        if _match_word(metadata["title"], form):
-            matched_forms_unique.add(form)
-
-    matched_composers_unique = set()
-    for composer in composer_names:
-        if _match_word(metadata["composer"], composer):
-            matched_composers_unique.add(composer)
+    matched_forms_unique = _match_names_cached(
+        metadata["title"], tuple(form_names)
+    )
+    matched_composers_unique = _match_names_cached(
+        metadata["composer"], tuple(composer_names)
+    )
 
     res = {}
-    matched_composers = list(matched_composers_unique)
-    matched_forms = list(matched_forms_unique)
-    if len(matched_forms) == 1:
-        res["form"] = matched_forms[0]
-    if len(matched_composers) == 1:
-        res["composer"] = matched_composers[0]
+    if len(matched_forms_unique) == 1:
+        (res["form"],) = matched_forms_unique
+    if len(matched_composers_unique) == 1:
+        (res["composer"],) = matched_composers_unique
 
     return res
 
@@ -1108,10 +1264,11 @@ def meta_aria_midi_json(midi_dict: MidiDict) -> dict[str, str]:
     if abs_load_path is None:
         return {}
 
-    metadata_path = Path(abs_load_path).parents[2] / "metadata.json"
-    idx = int(Path(abs_load_path).stem.split("_")[0])
+    load_path = Path(abs_load_path)
+    metadata_path = load_path.parents[2] / "metadata.json"
+    idx = int(load_path.stem.split("_")[0])
 
-    if os.path.isfile(metadata_path):
+    if metadata_path.is_file():
         metadata = load_aria_midi_metadata_json(metadata_path)
     else:
         return {}
@@ -1123,21 +1280,21 @@ def meta_aria_midi_json(midi_dict: MidiDict) -> dict[str, str]:
     return res
 
 
+_METADATA_FNS: Final[
+    dict[str, Callable[Concatenate[MidiDict, ...], dict[str, str]]]
+] = {
+    "composer_filename": meta_composer_filename,
+    "composer_metamsg": meta_composer_metamsg,
+    "form_filename": meta_form_filename,
+    "maestro_json": meta_maestro_json,
+    "aria_midi_json": meta_aria_midi_json,
+}
+
+
 def get_metadata_fn(
     metadata_process_name: str,
 ) -> Callable[Concatenate[MidiDict, ...], dict[str, str]]:
-    name_to_fn: dict[
-        str,
-        Callable[Concatenate[MidiDict, ...], dict[str, str]],
-    ] = {
-        "composer_filename": meta_composer_filename,
-        "composer_metamsg": meta_composer_metamsg,
-        "form_filename": meta_form_filename,
-        "maestro_json": meta_maestro_json,
-        "aria_midi_json": meta_aria_midi_json,
-    }
-
-    fn = name_to_fn.get(metadata_process_name, None)
+    fn = _METADATA_FNS.get(metadata_process_name, None)
     if fn is None:
         raise ValueError(
             f"Error finding metadata function for {metadata_process_name}"
@@ -1157,12 +1314,7 @@ def test_max_programs(midi_dict: MidiDict, max: int) -> tuple[bool, int]:
         bool: True if number of programs <= max, False otherwise
         int: Actual number of unique programs found
     """
-    present_programs = set(
-        map(
-            lambda msg: msg["data"],
-            midi_dict.instrument_msgs,
-        )
-    )
+    present_programs = midi_dict.present_programs
     is_valid = len(present_programs) <= max
 
     return is_valid, len(present_programs)
@@ -1179,12 +1331,7 @@ def test_max_instruments(midi_dict: MidiDict, max: int) -> tuple[bool, int]:
         bool: True if number of instruments <= max, False otherwise.
         int: Number of unique instruments found.
     """
-    present_instruments = set(
-        map(
-            lambda msg: midi_dict.program_to_instrument[msg["data"]],
-            midi_dict.instrument_msgs,
-        )
-    )
+    present_instruments = midi_dict.present_instruments
     is_valid = len(present_instruments) <= max
 
     return is_valid, len(present_instruments)
@@ -1208,11 +1355,9 @@ def test_note_frequency(
         return False, 0.0
 
     num_notes = len(midi_dict.note_msgs)
-    total_duration_ms = get_duration_ms(
+    total_duration_ms = midi_dict.duration_ms_between(
         start_tick=midi_dict.note_msgs[0]["data"]["start"],
         end_tick=midi_dict.note_msgs[-1]["data"]["end"],
-        tempo_msgs=midi_dict.tempo_msgs,
-        ticks_per_beat=midi_dict.ticks_per_beat,
     )
 
     if total_duration_ms == 0:
@@ -1238,24 +1383,14 @@ def test_note_frequency_per_instrument(
         bool: True if frequency is within bounds, False otherwise.
         float: Actual notes per second per instrument found.
     """
-    num_instruments = len(
-        set(
-            map(
-                lambda msg: midi_dict.program_to_instrument[msg["data"]],
-                midi_dict.instrument_msgs,
-            )
-        )
-    )
-
     if not midi_dict.note_msgs or not midi_dict.instrument_msgs:
         return False, 0.0
 
+    num_instruments = len(midi_dict.present_instruments)
     num_notes = len(midi_dict.note_msgs)
-    total_duration_ms = get_duration_ms(
+    total_duration_ms = midi_dict.duration_ms_between(
         start_tick=midi_dict.note_msgs[0]["data"]["start"],
         end_tick=midi_dict.note_msgs[-1]["data"]["end"],
-        tempo_msgs=midi_dict.tempo_msgs,
-        ticks_per_beat=midi_dict.ticks_per_beat,
     )
 
     if total_duration_ms == 0:
@@ -1346,9 +1481,9 @@ def test_mean_note_len(
     if not note_msgs_nd:
         return False, 0.0
 
+    tick_to_ms = midi_dict.get_tick_to_ms_fn()
     note_lengths = [
-        midi_dict.tick_to_ms(msg["data"]["end"])
-        - midi_dict.tick_to_ms(msg["data"]["start"])
+        tick_to_ms(msg["data"]["end"]) - tick_to_ms(msg["data"]["start"])
         for msg in note_msgs_nd
     ]
 
@@ -1379,7 +1514,8 @@ def test_silent_interval(
     last_note_end_tick = midi_dict.note_msgs[0]["data"]["end"]
 
     for note_msg in midi_dict.note_msgs[1:]:
-        note_start_tick = note_msg["data"]["start"]
+        note_data = note_msg["data"]
+        note_start_tick = note_data["start"]
 
         if note_start_tick > last_note_end_tick:
             longest_silence_s = max(
@@ -1396,7 +1532,7 @@ def test_silent_interval(
             if longest_silence_s >= max_silence_s:
                 return False, longest_silence_s
 
-        last_note_end_tick = max(last_note_end_tick, note_msg["data"]["end"])
+        last_note_end_tick = max(last_note_end_tick, note_data["end"])
 
     return True, longest_silence_s
 
@@ -1431,21 +1567,28 @@ def test_unique_pitch_count(
         return True, unique_pitches
 
 
-def _test_unique_pitch_count_in_interval(
-    midi_dict: MidiDict,
-    min_unique_pitch_cnt: int,
-    interval_len_s: float,
-) -> tuple[bool, tuple[int, float]]:
+def _get_note_onset_events(midi_dict: MidiDict) -> list[tuple[float, int]]:
+    """Returns (onset_s, pitch) for all non-drum notes, sorted by onset."""
+    tick_to_ms = midi_dict.get_tick_to_ms_fn()
     note_events = [
         (
+            tick_to_ms(note_msg["data"]["start"]) / 1000.0,
             note_msg["data"]["pitch"],
-            midi_dict.tick_to_ms(note_msg["data"]["start"]),
         )
         for note_msg in midi_dict.note_msgs
         if note_msg["channel"] != 9
     ]
-    note_events = sorted(note_events, key=lambda x: x[1])
+    note_events.sort()
+
+    return note_events
 
+
+def _test_unique_pitch_count_in_interval(
+    midi_dict: MidiDict,
+    note_events: list[tuple[float, int]],
+    min_unique_pitch_cnt: int,
+    interval_len_s: float,
+) -> tuple[bool, tuple[int, float]]:
     if not note_events:
         return False, (0, 0)
 
@@ -1456,30 +1599,23 @@ def _test_unique_pitch_count_in_interval(
     min_window_pitch_count_seen = 128
     min_window_start_s = 0.0
     end_idx = 0
-    notes_in_window: Deque[tuple[int, int]] = deque()
-    while end_idx < len(note_events):
+    num_note_events = len(note_events)
+    notes_in_window: Deque[tuple[float, int]] = deque()
+    while end_idx < num_note_events:
         interval_end_s = interval_start_s + interval_len_s
 
-        for note_msg_tuple in note_events[end_idx:]:
-            _, _start_ms = note_msg_tuple
-            _start_s = _start_ms / 1000.0
-            if _start_s <= interval_end_s:
-                notes_in_window.append(note_msg_tuple)
-                end_idx += 1
-            else:
-                break
+        while (
+            end_idx < num_note_events
+            and note_events[end_idx][0] <= interval_end_s
+        ):
+            notes_in_window.append(note_events[end_idx])
+            end_idx += 1
 
-        if len(notes_in_window) > 0:
-            while notes_in_window:
-                _, _start_ms = notes_in_window[0]
-                _start_s = _start_ms / 1000.0
-                if _start_s < interval_start_s:
-                    notes_in_window.popleft()
-                else:
-                    break
+        while notes_in_window and notes_in_window[0][0] < interval_start_s:
+            notes_in_window.popleft()
 
         unique_pitches_in_window = {
-            note_tuple[0] for note_tuple in notes_in_window
+            note_tuple[1] for note_tuple in notes_in_window
         }
 
         if len(unique_pitches_in_window) < min_window_pitch_count_seen:
@@ -1516,10 +1652,12 @@ def test_unique_pitch_count_in_interval(
             - window_start_s: Start time of the window in seconds
     """
 
+    note_events = _get_note_onset_events(midi_dict)
     for test_params in test_params_list:
         success, (pitch_cnt, window_start_s) = (
             _test_unique_pitch_count_in_interval(
                 midi_dict=midi_dict,
+                note_events=note_events,
                 min_unique_pitch_cnt=test_params["min_unique_pitch_cnt"],
                 interval_len_s=test_params["interval_len_s"],
             )
@@ -1536,21 +1674,11 @@ def test_unique_pitch_count_in_interval(
 
 
 def _test_note_density_in_interval(
-    midi_dict: "MidiDict",
+    note_events: list[tuple[float, int]],
     max_notes_per_second: int,
     max_notes_per_second_per_pitch: int,
     interval_len_s: float,
 ) -> tuple[bool, tuple[float, float, int]]:
-    note_events = [
-        (
-            midi_dict.tick_to_ms(note_msg["data"]["start"]) / 1000.0,
-            note_msg["data"]["pitch"],
-        )
-        for note_msg in midi_dict.note_msgs
-        if note_msg["channel"] != 9
-    ]
-    note_events.sort()
-
     if not note_events:
         return False, (0.0, 0.0, 0)
 
@@ -1560,19 +1688,22 @@ def _test_note_density_in_interval(
     max_window_start_s: int = 0
     max_pitch_cnt_seen = 0
     end_idx = 0
+    num_note_events = len(note_events)
     notes_in_window: Deque[tuple[float, int]] = deque()
     pitch_cnts: dict[int, int] = {}
 
-    while end_idx < len(note_events):
+    while end_idx < num_note_events:
         interval_end_s = interval_start_s + interval_len_s
 
-        for time_s, pitch in note_events[end_idx:]:
-            if time_s <= interval_end_s:
-                notes_in_window.append((time_s, pitch))
-                pitch_cnts[pitch] = pitch_cnts.get(pitch, 0) + 1
-                end_idx += 1
-            else:
-                break
+        while (
+            end_idx < num_note_events
+            and note_events[end_idx][0] <= interval_end_s
+        ):
+            note_event = note_events[end_idx]
+            notes_in_window.append(note_event)
+            pitch = note_event[1]
+            pitch_cnts[pitch] = pitch_cnts.get(pitch, 0) + 1
+            end_idx += 1
 
         if notes_in_window:
             while notes_in_window and notes_in_window[0][0] < interval_start_s:
@@ -1631,6 +1762,7 @@ def test_note_density_in_interval(
             - window_start_s: Start time of the window in seconds
     """
 
+    note_events = _get_note_onset_events(midi_dict)
     for test_params in test_params_list:
         (
             success,
@@ -1640,7 +1772,7 @@ def test_note_density_in_interval(
                 interval_start_s,
             ),
         ) = _test_note_density_in_interval(
-            midi_dict=midi_dict,
+            note_events=note_events,
             max_notes_per_second=test_params["max_notes_per_second"],
             max_notes_per_second_per_pitch=test_params[
                 "max_notes_per_second_per_pitch"
@@ -1696,12 +1828,14 @@ def test_note_timing_entropy(
     if not note_msgs_nd:
         return False, (0.0, 0.0)
 
+    tick_to_ms = midi_dict.get_tick_to_ms_fn()
     note_lens = []
     note_onset_deltas = []
     for prev_msg, msg in zip(note_msgs_nd, note_msgs_nd[1:]):
-        prev_msg_start_ms = midi_dict.tick_to_ms(prev_msg["data"]["start"])
-        start_ms = midi_dict.tick_to_ms(msg["data"]["start"])
-        end_ms = midi_dict.tick_to_ms(msg["data"]["end"])
+        data = msg["data"]
+        prev_msg_start_ms = tick_to_ms(prev_msg["data"]["start"])
+        start_ms = tick_to_ms(data["start"])
+        end_ms = tick_to_ms(data["end"])
 
         note_onset_delta_ms = start_ms - prev_msg_start_ms
         duration_ms = end_ms - start_ms
@@ -1799,12 +1933,9 @@ def test_repetitive_content(
     if not note_msgs_nd:
         return False, 0.0
 
-    start_time_s = (
-        midi_dict.tick_to_ms(note_msgs_nd[0]["data"]["start"]) / 1000.0
-    )
-    end_time_s = (
-        midi_dict.tick_to_ms(note_msgs_nd[-1]["data"]["start"]) / 1000.0
-    )
+    tick_to_ms = midi_dict.get_tick_to_ms_fn()
+    start_time_s = tick_to_ms(note_msgs_nd[0]["data"]["start"]) / 1000.0
+    end_time_s = tick_to_ms(note_msgs_nd[-1]["data"]["start"]) / 1000.0
     duration_s = end_time_s - start_time_s
 
     if duration_s / 60.0 < min_length_m:
@@ -1824,9 +1955,7 @@ def test_repetitive_content(
 
         curr_chunk_pitches: dict[int, int] = {p: 0 for p in range(0, 128)}
         while msg_idx < len(note_msgs_nd):
-            note_start_ms = midi_dict.tick_to_ms(
-                note_msgs_nd[msg_idx]["data"]["start"]
-            )
+            note_start_ms = tick_to_ms(note_msgs_nd[msg_idx]["data"]["start"])
 
             if note_start_ms >= chunk_end_ms:
                 break
@@ -1870,29 +1999,30 @@ def test_repetitive_content(
 
 
 # TODO: Refactor tests into a new module
+_TEST_FNS: Final[
+    dict[str, Callable[Concatenate[MidiDict, ...], tuple[bool, Any]]]
+] = {
+    "max_programs": test_max_programs,
+    "max_instruments": test_max_instruments,
+    "total_note_frequency": test_note_frequency,
+    "note_frequency_per_instrument": test_note_frequency_per_instrument,
+    "length": test_length,
+    "mean_note_len": test_mean_note_len,
+    "mean_note_velocity": test_mean_note_velocity,
+    "silent_interval": test_silent_interval,
+    "unique_pitch_count": test_unique_pitch_count,
+    "unique_pitch_count_in_interval": test_unique_pitch_count_in_interval,
+    "note_density_in_interval": test_note_density_in_interval,
+    "note_timing_entropy": test_note_timing_entropy,
+    "note_pitch_entropy": test_note_pitch_entropy,
+    "repetitive_content": test_repetitive_content,
+}
+
+
 def get_test_fn(
     test_name: str,
 ) -> Callable[Concatenate[MidiDict, ...], tuple[bool, Any]]:
-    name_to_fn: dict[
-        str, Callable[Concatenate[MidiDict, ...], tuple[bool, Any]]
-    ] = {
-        "max_programs": test_max_programs,
-        "max_instruments": test_max_instruments,
-        "total_note_frequency": test_note_frequency,
-        "note_frequency_per_instrument": test_note_frequency_per_instrument,
-        "length": test_length,
-        "mean_note_len": test_mean_note_len,
-        "mean_note_velocity": test_mean_note_velocity,
-        "silent_interval": test_silent_interval,
-        "unique_pitch_count": test_unique_pitch_count,
-        "unique_pitch_count_in_interval": test_unique_pitch_count_in_interval,
-        "note_density_in_interval": test_note_density_in_interval,
-        "note_timing_entropy": test_note_timing_entropy,
-        "note_pitch_entropy": test_note_pitch_entropy,
-        "repetitive_content": test_repetitive_content,
-    }
-
-    fn = name_to_fn.get(test_name, None)
+    fn = _TEST_FNS.get(test_name, None)
     if fn is None:
         raise ValueError(
             f"Error finding preprocessing function for {test_name}"
@@ -1946,8 +2076,9 @@ def normalize_midi_dict(
             for idx, instrument in enumerate(instruments)
         }
 
+        program_to_instrument = midi_dict.program_to_instrument
         old_channel_to_instrument = {
-            msg["channel"]: midi_dict.program_to_instrument[msg["data"]]
+            msg["channel"]: program_to_instrument[msg["data"]]
             for msg in midi_dict.instrument_msgs
         }
         old_channel_to_instrument[9] = "drum"
@@ -1982,31 +2113,30 @@ def normalize_midi_dict(
         def _quantize_time(_n: int) -> int:
             return round(_n / time_step_ms) * time_step_ms
 
+        tick_to_ms = midi_dict.get_tick_to_ms_fn()
         note_msgs: list[NoteMessage] = []
         for msg in midi_dict.note_msgs:
             msg_channel = msg["channel"]
             instrument = old_channel_to_instrument[msg_channel]
             new_msg_channel = new_instrument_to_channel[instrument]
 
-            start_tick = _quantize_time(
-                midi_dict.tick_to_ms(msg["data"]["start"])
-            )
-            end_tick = _quantize_time(midi_dict.tick_to_ms(msg["data"]["end"]))
-            velocity = quantize_velocity_fn(msg["data"]["velocity"])
+            data = msg["data"]
+            start_tick = _quantize_time(tick_to_ms(data["start"]))
+            end_tick = _quantize_time(tick_to_ms(data["end"]))
+            velocity = quantize_velocity_fn(data["velocity"])
 
             new_msg = copy.deepcopy(msg)
+            new_data = new_msg["data"]
             new_msg["channel"] = new_msg_channel
             new_msg["tick"] = start_tick
-            new_msg["data"]["start"] = start_tick
+            new_data["start"] = start_tick
 
             if new_msg_channel != 9:
-                new_msg["data"]["end"] = min(
-                    start_tick + max_duration_ms, end_tick
-                )
-                new_msg["data"]["velocity"] = velocity
+                new_data["end"] = min(start_tick + max_duration_ms, end_tick)
+                new_data["velocity"] = velocity
             else:
-                new_msg["data"]["end"] = start_tick + time_step_ms
-                new_msg["data"]["velocity"] = drum_velocity
+                new_data["end"] = start_tick + time_step_ms
+                new_data["velocity"] = drum_velocity
 
             note_msgs.append(new_msg)
 
@@ -2049,3 +2179,164 @@ def normalize_midi_dict(
         ticks_per_beat=500,
         metadata={},
     )
+
+
+# Path, MidiDict (None on failure), test results, and the error (if any) for
+# each file processed by process_corpus
+_CorpusFileResult: TypeAlias = tuple[
+    str | Path, MidiDict | None, dict[str, tuple[bool, Any]], str | None
+]
+
+
+def _init_process_corpus_worker(metadata_fns: dict[str, dict]) -> None:
+    # Parse the MAESTRO metadata once per worker, rather than in the first
+    # call to meta_maestro_json on each worker
+    if "maestro_json" in metadata_fns:
+        load_maestro_metadata_json()
+
+
+def _process_corpus_file(
+    mid_path: str | Path,
+    metadata_fns: dict[str, dict],
+    test_fns: dict[str, dict],
+    collect_meta_msgs: bool,
+) -> _CorpusFileResult:
+    try:
+        midi_dict = MidiDict.from_midi(
+            mid_path, collect_meta_msgs=collect_meta_msgs
+        )
+        for metadata_process_name, metadata_fn_args in metadata_fns.items():
+            midi_dict.metadata.update(
+                get_metadata_fn(metadata_process_name)(
+                    midi_dict, **metadata_fn_args
+                )
+            )
+
+        test_results = {
+            test_name: get_test_fn(test_name)(midi_dict, **test_fn_args)
+            for test_name, test_fn_args in test_fns.items()
+        }
+    except Exception as e:
+        return mid_path, None, {}, f"{type(e).__name__}: {e}"
+
+    return mid_path, midi_dict, test_results, None
+
+
+def process_corpus(
+    mid_paths: Iterable[str | Path],
+    metadata_fns: dict[str, dict] | None = None,
+    test_fns: dict[str, dict] | None = None,
+    collect_meta_msgs: bool = True,
+    num_workers: int | None = None,
+    max_pending: int | None = None,
+) -> Iterator[_CorpusFileResult]:
+    """Loads MIDI files and applies metadata and test functions in parallel.
+
+    Each file is processed independently in a pool of worker processes.
+    Results are yielded in the same order as mid_paths. At most max_pending
+    files are submitted ahead of the result being yielded, so only a bounded
+    number of MidiDicts are held at once. If a file can't be processed, a
+    warning is logged and (mid_path, None, {}, error) is yielded in its place.
+
+    Args:
+        mid_paths (Iterable[str | Path]): Paths of the MIDI files to process.
+        metadata_fns (dict[str, dict] | None): Mapping of metadata function
+            names (see get_metadata_fn) to keyword arguments for that function.
+            The resulting metadata is added to MidiDict.metadata.
+        test_fns (dict[str, dict] | None): Mapping of test function names
+            (see get_test_fn) to keyword arguments for that function.
+        collect_meta_msgs (bool): Whether to parse text and copyright meta
+            messages, see midi_to_dict. Required by "composer_metamsg".
+        num_workers (int | None): Number of worker processes. Defaults to the
+            number of CPUs.
+        max_pending (int | None): Maximum number of files which are being
+            processed, or whose results are waiting to be yielded. Defaults to
+            four times num_workers.
+
+    Yields:
+        tuple[str | Path, MidiDict | None, dict[str, tuple[bool, Any]],
+            str | None]: The path of each file, its MidiDict, a mapping of test
+            names to test results, and a description of the error if the file
+            couldn't be processed.
+    """
+
+    if metadata_fns is None:
+        metadata_fns = {}
+    if test_fns is None:
+        test_fns = {}
+
+    # Fail before starting any workers if the arguments can't be used
+    for metadata_process_name in metadata_fns:
+        get_metadata_fn(metadata_process_name)
+    for test_name in test_fns:
+        get_test_fn(test_name)
+
+    if "composer_metamsg" in metadata_fns and not collect_meta_msgs:
+        raise ValueError("composer_metamsg requires collect_meta_msgs=True")
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 4 * num_workers
+    if max_pending < 1:
+        raise ValueError("max_pending must be at least 1")
+    if "maestro_json" in metadata_fns:
+        try:
+            load_maestro_metadata_json()
+        except FileNotFoundError as e:
+            raise FileNotFoundError(
+                "maestro_json requires maestro_metadata.json in "
+                "ariautils.config"
+            ) from e
+
+    return _iter_process_corpus(
+        mid_paths=mid_paths,
+        metadata_fns=metadata_fns,
+        test_fns=test_fns,
+        collect_meta_msgs=collect_meta_msgs,
+        num_workers=num_workers,
+        max_pending=max_pending,
+    )
+
+
+def _iter_process_corpus(
+    mid_paths: Iterable[str | Path],
+    metadata_fns: dict[str, dict],
+    test_fns: dict[str, dict],
+    collect_meta_msgs: bool,
+    num_workers: int,
+    max_pending: int,
+) -> Iterator[_CorpusFileResult]:
+    process_file = partial(
+        _process_corpus_file,
+        metadata_fns=metadata_fns,
+        test_fns=test_fns,
+        collect_meta_msgs=collect_meta_msgs,
+    )
+    mid_paths_iter = iter(mid_paths)
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_process_corpus_worker,
+        initargs=(metadata_fns,),
+    ) as executor:
+        pending: Deque[Future[_CorpusFileResult]] = deque(
+            executor.submit(process_file, mid_path)
+            for mid_path in islice(mid_paths_iter, max_pending)
+        )
+        try:
+            while pending:
+                result = pending.popleft().result()
+                # Refill before yielding, so that workers stay busy while the
+                # caller handles the result
+                for mid_path in islice(mid_paths_iter, 1):
+                    pending.append(executor.submit(process_file, mid_path))
+
+                mid_path, _, _, error = result
+                if error is not None:
+                    logger.warning(f"Failed to process {mid_path}: {error}")
+
+                yield result
+        finally:
+            # If the caller stops early, don't process the remaining files
+            for future in pending:
+                future.cancel()
@@ -179,8 +179,9 @@ class RelTokenizer(Tokenizer):
 
         channels_used = {msg["channel"] for msg in midi_dict.note_msgs}
 
+        program_to_instrument = midi_dict.program_to_instrument
         channel_to_instrument = {
-            msg["channel"]: midi_dict.program_to_instrument[msg["data"]]
+            msg["channel"]: program_to_instrument[msg["data"]]
             for msg in midi_dict.instrument_msgs
             if msg["channel"] != 9  # Exclude drums
         }
@@ -1,6 +1,5 @@
 """Miscellaneous utilities."""
 
-import json
 import logging
 
 from importlib import resources
@@ -8,7 +7,7 @@ from pathlib import Path
 from functools import lru_cache
 from typing import Any, cast
 
-from .config import load_config
+from .config import load_config, json_loads
 
 
 def get_logger(name: str | None) -> logging.Logger:
@@ -42,12 +41,14 @@ def warn_once(logger_name: str, message: str):
 @lru_cache(maxsize=1)
 def load_maestro_metadata_json() -> dict[str, Any]:
     """Loads MAESTRO metadata json ."""
-    with (
-        resources.files("ariautils.config")
-        .joinpath("maestro_metadata.json")
-        .open("r") as f
-    ):
-        return cast(dict[str, Any], json.load(f))
+    return cast(
+        dict[str, Any],
+        json_loads(
+            resources.files("ariautils.config")
+            .joinpath("maestro_metadata.json")
+            .read_bytes()
+        ),
+    )
 
 
 @lru_cache(maxsize=1)
@@ -63,15 +64,18 @@ def load_aria_midi_metadata_json(
                 )
             )
         )
-    with open(str(metadata_load_path), "r") as f:
+    with open(str(metadata_load_path), "rb") as f:
         return {
             int(k): v
-            for k, v in cast(dict[int, dict[str, Any]], json.load(f)).items()
+            for k, v in cast(
+                dict[int, dict[str, Any]], json_loads(f.read())
+            ).items()
         }
 
 
 __all__ = [
     "load_config",
+    "json_loads",
     "load_maestro_metadata_json",
     "load_aria_midi_metadata_json",
     "get_logger",
@@ -6,16 +6,30 @@ from pathlib import Path
 from importlib import resources
 from typing import Any, cast
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data: bytes) -> Any:
+    """Decodes json, using orjson if it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    else:
+        return json.loads(data)
+
 
 def load_config(load_path: Path | str | None = None) -> dict[str, Any]:
     """Returns a dictionary loaded from the config.json file."""
     if load_path is not None:
-        with open(load_path, "r") as f:
-            return cast(dict[str, Any], json.load(f))
+        return cast(dict[str, Any], json_loads(Path(load_path).read_bytes()))
     else:
-        with (
-            resources.files("ariautils.config")
-            .joinpath("config.json")
-            .open("r") as f
-        ):
-            return cast(dict[str, Any], json.load(f))
+        return cast(
+            dict[str, Any],
+            json_loads(
+                resources.files("ariautils.config")
+                .joinpath("config.json")
+                .read_bytes()
+            ),
+        )
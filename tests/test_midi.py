@@ -9,7 +9,17 @@ from importlib import resources
 from pathlib import Path
 from typing import Final
 
-from ariautils.midi import MidiDict
+from ariautils.midi import (
+    MidiDict,
+    MidiDictData,
+    NoteMessage,
+    PedalMessage,
+    midi_to_dict,
+    dict_to_midi,
+    get_metadata_fn,
+    get_test_fn,
+    process_corpus,
+)
 from ariautils.utils import get_logger
 
 
@@ -21,6 +31,55 @@ RESULTS_DATA_DIRECTORY: Final[Path] = Path(
 )
 
 
+def _note_msg(
+    pitch: int, start: int, end: int, channel: int = 0
+) -> NoteMessage:
+    return {
+        "type": "note",
+        "data": {"pitch": pitch, "start": start, "end": end, "velocity": 64},
+        "tick": start,
+        "channel": channel,
+    }
+
+
+def _pedal_msg(data: int, tick: int, channel: int = 0) -> PedalMessage:
+    return {
+        "type": "pedal",
+        "data": data,
+        "value": 127 * data,
+        "tick": tick,
+        "channel": channel,
+    }
+
+
+def _msg_dict(
+    note_msgs: list[NoteMessage], pedal_msgs: list[PedalMessage]
+) -> MidiDictData:
+    return {
+        "meta_msgs": [],
+        "tempo_msgs": [],
+        "pedal_msgs": pedal_msgs,
+        "instrument_msgs": [],
+        "note_msgs": note_msgs,
+        "ticks_per_beat": 480,
+        "metadata": {},
+    }
+
+
+def _note_spans(midi_dict: MidiDict) -> list[tuple[int, int, int]]:
+    return [
+        (msg["data"]["pitch"], msg["data"]["start"], msg["data"]["end"])
+        for msg in midi_dict.note_msgs
+    ]
+
+
+def _pedal_states(midi_dict: MidiDict) -> list[tuple[int, int, int]]:
+    return [
+        (msg["data"], msg["tick"], msg["channel"])
+        for msg in midi_dict.pedal_msgs
+    ]
+
+
 class TestMidiDict(unittest.TestCase):
     def setUp(self) -> None:
         self.logger = get_logger(__name__ + ".TestMidiDict")
@@ -39,6 +98,113 @@ class TestMidiDict(unittest.TestCase):
         self.logger.info(f"ticks_per_beat: {midi_dict.ticks_per_beat}")
         self.logger.info(f"metadata: {midi_dict.metadata}")
 
+    def test_midi_to_dict_does_not_modify_input(self) -> None:
+        load_path = TEST_DATA_DIRECTORY.joinpath("arabesque.mid")
+        mid = mido.MidiFile(load_path)
+        times_before = [[msg.time for msg in track] for track in mid.tracks]
+
+        midi_dict = MidiDict(**midi_to_dict(mid))
+
+        self.assertEqual(
+            [[msg.time for msg in track] for track in mid.tracks],
+            times_before,
+        )
+        self.assertEqual(
+            midi_dict.note_msgs, MidiDict.from_midi(load_path).note_msgs
+        )
+
+    def test_load_without_meta_msgs(self) -> None:
+        load_path = TEST_DATA_DIRECTORY.joinpath("arabesque.mid")
+        midi_dict = MidiDict.from_midi(load_path)
+        midi_dict_no_meta = MidiDict.from_midi(
+            load_path, collect_meta_msgs=False
+        )
+
+        self.assertGreater(len(midi_dict.meta_msgs), 0)
+        self.assertEqual(midi_dict_no_meta.meta_msgs, [])
+        self.assertEqual(midi_dict.note_msgs, midi_dict_no_meta.note_msgs)
+
+    def test_meta_composer_filename(self) -> None:
+        meta_fn = get_metadata_fn("composer_filename")
+        midi_dict = MidiDict.from_midi(
+            TEST_DATA_DIRECTORY.joinpath("arabesque.mid")
+        )
+
+        midi_dict.metadata["abs_load_path"] = "/data/Bach_Prelude in C.mid"
+        self.assertEqual(
+            meta_fn(midi_dict, ["bach", "chopin", "debussy"]),
+            {"composer": "bach"},
+        )
+        self.assertEqual(meta_fn(midi_dict, ["bach", "prelude"]), {})
+        self.assertEqual(meta_fn(midi_dict, ["ach", "c++"]), {})
+
+        midi_dict.metadata["abs_load_path"] = "/data/Dvořák_Humoresque.mid"
+        self.assertEqual(
+            meta_fn(midi_dict, ["bach", "dvorak"]), {"composer": "dvorak"}
+        )
+
+    def test_process_corpus(self) -> None:
+        load_paths = [
+            TEST_DATA_DIRECTORY.joinpath("arabesque.mid"),
+            TEST_DATA_DIRECTORY.joinpath("pop.mid"),
+        ]
+        metadata_fns = {"composer_filename": {"composer_names": ["debussy"]}}
+        test_fns = {
+            "length": {"min_length_s": 30, "max_length_s": 3600},
+            "unique_pitch_count": {"min_num_unique_pitches": 12},
+        }
+
+        with tempfile.NamedTemporaryFile(suffix=".mid") as bad_file:
+            bad_file.write(b"not a midi file")
+            bad_file.flush()
+            results = list(
+                process_corpus(
+                    [load_paths[0], bad_file.name, load_paths[1]],
+                    metadata_fns=metadata_fns,
+                    test_fns=test_fns,
+                    num_workers=2,
+                    max_pending=1,
+                )
+            )
+
+        # Failing files don't affect the results for other files
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[1][:3], (bad_file.name, None, {}))
+        bad_file_error = results[1][3]
+        assert bad_file_error is not None
+        self.assertIn("MThd not found", bad_file_error)
+        del results[1]
+
+        for load_path, (mid_path, midi_dict, test_results, error) in zip(
+            load_paths, results
+        ):
+            expected_midi_dict = MidiDict.from_midi(load_path)
+            self.assertEqual(mid_path, load_path)
+            self.assertIsNone(error)
+            assert midi_dict is not None
+            self.assertEqual(
+                midi_dict.calculate_hash(), expected_midi_dict.calculate_hash()
+            )
+            self.assertEqual(midi_dict.meta_msgs, expected_midi_dict.meta_msgs)
+            self.assertEqual(
+                test_results,
+                {
+                    test_name: get_test_fn(test_name)(
+                        expected_midi_dict, **test_fn_args
+                    )
+                    for test_name, test_fn_args in test_fns.items()
+                },
+            )
+
+        with self.assertRaises(ValueError):
+            process_corpus(
+                load_paths,
+                metadata_fns={"composer_metamsg": {"composer_names": []}},
+                collect_meta_msgs=False,
+            )
+        with self.assertRaises(ValueError):
+            process_corpus(load_paths, max_pending=0)
+
     def test_save(self) -> None:
         load_path = TEST_DATA_DIRECTORY.joinpath("arabesque.mid")
         save_path = RESULTS_DATA_DIRECTORY.joinpath("arabesque.mid")
@@ -54,6 +220,102 @@ class TestMidiDict(unittest.TestCase):
         last_note_onset_ms = midi_dict.tick_to_ms(last_note_onset_tick)
         self.assertEqual(last_note_onset_ms, CORRECT_LAST_NOTE_ONSET_MS)
 
+    def test_tick_to_ms_tempo_msgs_reassigned(self) -> None:
+        midi_dict = MidiDict.from_msg_dict(
+            {
+                "meta_msgs": [],
+                "tempo_msgs": [
+                    {"type": "tempo", "data": 500000, "tick": 0},
+                    {"type": "tempo", "data": 250000, "tick": 960},
+                ],
+                "pedal_msgs": [],
+                "instrument_msgs": [],
+                "note_msgs": [],
+                "ticks_per_beat": 480,
+                "metadata": {},
+            }
+        )
+        self.assertEqual(midi_dict.tick_to_ms(480), 500)
+        self.assertEqual(midi_dict.tick_to_ms(1440), 1250)
+        self.assertEqual(midi_dict.duration_ms_between(480, 1440), 750)
+
+        midi_dict.tempo_msgs = [{"type": "tempo", "data": 250000, "tick": 0}]
+        self.assertEqual(midi_dict.tick_to_ms(480), 250)
+        self.assertEqual(midi_dict.tick_to_ms(1440), 750)
+        self.assertEqual(midi_dict.duration_ms_between(480, 1440), 500)
+
+    def test_tick_to_ms_tempo_msgs_modified_inplace(self) -> None:
+        midi_dict = MidiDict.from_msg_dict(
+            {
+                "meta_msgs": [],
+                "tempo_msgs": [{"type": "tempo", "data": 500000, "tick": 0}],
+                "pedal_msgs": [],
+                "instrument_msgs": [],
+                "note_msgs": [],
+                "ticks_per_beat": 480,
+                "metadata": {},
+            }
+        )
+        self.assertEqual(midi_dict.tick_to_ms(1440), 1500)
+        self.assertEqual(midi_dict.duration_ms_between(480, 1440), 1000)
+
+        tick_to_ms = midi_dict.get_tick_to_ms_fn()
+        self.assertEqual(tick_to_ms(1440), 1500)
+
+        midi_dict.tempo_msgs.append(
+            {"type": "tempo", "data": 250000, "tick": 960}
+        )
+        self.assertEqual(midi_dict.tick_to_ms(1440), 1250)
+        self.assertEqual(midi_dict.duration_ms_between(480, 1440), 750)
+
+        midi_dict.tempo_msgs[-1]["data"] = 1000000
+        self.assertEqual(midi_dict.tick_to_ms(1440), 2000)
+        self.assertEqual(midi_dict.duration_ms_between(480, 1440), 1500)
+
+        midi_dict.tempo_msgs[0]["data"] = 250000
+        self.assertEqual(midi_dict.tick_to_ms(1440), 1500)
+        self.assertEqual(midi_dict.duration_ms_between(480, 1440), 1250)
+
+        midi_dict.ticks_per_beat = 960
+        self.assertEqual(midi_dict.tick_to_ms(1440), 750)
+
+        # Functions returned earlier keep using the tempos they were built from
+        self.assertEqual(tick_to_ms(1440), 1500)
+        self.assertEqual(midi_dict.get_tick_to_ms_fn()(1440), 750)
+
+    def test_present_instruments(self) -> None:
+        midi_dict = MidiDict.from_msg_dict(
+            {
+                "meta_msgs": [],
+                "tempo_msgs": [],
+                "pedal_msgs": [],
+                "instrument_msgs": [
+                    {"type": "instrument", "data": 0, "tick": 0, "channel": 0},
+                    {"type": "instrument", "data": 1, "tick": 0, "channel": 1},
+                    {"type": "instrument", "data": 40, "tick": 0, "channel": 2},
+                ],
+                "note_msgs": [],
+                "ticks_per_beat": 480,
+                "metadata": {},
+            }
+        )
+        self.assertEqual(midi_dict.present_programs, {0, 1, 40})
+        self.assertEqual(midi_dict.present_instruments, {"piano", "strings"})
+
+        midi_dict.instrument_msgs = midi_dict.instrument_msgs[:1]
+        self.assertEqual(midi_dict.present_programs, {0})
+        self.assertEqual(midi_dict.present_instruments, {"piano"})
+
+        midi_dict.instrument_msgs.append(
+            {"type": "instrument", "data": 24, "tick": 0, "channel": 1}
+        )
+        self.assertEqual(midi_dict.present_programs, {0, 24})
+        self.assertEqual(midi_dict.present_instruments, {"piano", "guitar"})
+
+        midi_dict.instrument_msgs[0]["data"] = 40
+        self.assertEqual(midi_dict.present_programs, {40, 24})
+        self.assertEqual(midi_dict.present_instruments, {"strings", "guitar"})
+
     def test_calculate_hash(self) -> None:
         # Load two identical files with different filenames and metadata
         load_path = TEST_DATA_DIRECTORY.joinpath("arabesque.mid")
@@ -254,3 +516,110 @@ class TestMidiDict(unittest.TestCase):
             self.assertDictEqual(msg_1, msg_2)
 
         midi_dict_adj_resolve.to_midi().save(save_path)
+
+    def test_pedal_zero_length_interval(self) -> None:
+        def _get_midi_dict() -> MidiDict:
+            return MidiDict.from_msg_dict(
+                _msg_dict(
+                    note_msgs=[
+                        _note_msg(60, 0, 100),
+                        _note_msg(62, 50, 150),
+                        _note_msg(64, 150, 300),
+                    ],
+                    pedal_msgs=[
+                        _pedal_msg(1, 100),
+                        _pedal_msg(0, 100),
+                        _pedal_msg(1, 200),
+                        _pedal_msg(0, 400),
+                    ],
+                )
+            )
+
+        # A note ending exactly at a zero-length interval is not extended
+        self.assertEqual(
+            _note_spans(_get_midi_dict().resolve_pedal()),
+            [(60, 0, 100), (62, 50, 150), (64, 150, 400)],
+        )
+        self.assertEqual(
+            _pedal_states(_get_midi_dict().remove_redundant_pedals()),
+            [(1, 200, 0), (0, 400, 0)],
+        )
+
+    def test_pedal_unclosed(self) -> None:
+        def _get_midi_dict() -> MidiDict:
+            return MidiDict.from_msg_dict(
+                _msg_dict(
+                    note_msgs=[
+                        _note_msg(60, 0, 100),
+                        _note_msg(64, 20, 600, channel=1),
+                        _note_msg(62, 50, 150),
+                    ],
+                    pedal_msgs=[
+                        _pedal_msg(1, 50),
+                        _pedal_msg(1, 500, channel=1),
+                    ],
+                )
+            )
+
+        # Unclosed pedals are closed at the end of the final note msg. The
+        # pedal on channel 1 starts after that, so it extends nothing.
+        self.assertEqual(
+            _note_spans(_get_midi_dict().resolve_pedal()),
+            [(60, 0, 150), (64, 20, 600), (62, 50, 150)],
+        )
+        # Only the final pedal msg is checked for being unclosed
+        self.assertEqual(
+            _pedal_states(_get_midi_dict().remove_redundant_pedals()),
+            [(1, 50, 0)],
+        )
+
+    def test_remove_redundant_pedals_across_channels(self) -> None:
+        def _get_midi_dict(note_end: int) -> MidiDict:
+            return MidiDict.from_msg_dict(
+                _msg_dict(
+                    note_msgs=[
+                        _note_msg(60, 0, note_end),
+                        _note_msg(62, 0, 50, channel=1),
+                    ],
+                    pedal_msgs=[
+                        _pedal_msg(1, 0, channel=1),
+                        _pedal_msg(1, 30),
+                        _pedal_msg(0, 40),
+                    ],
+                )
+            )
+
+        # The unclosed pedal on channel 1 is removed only once the redundant
+        # pedal on channel 0 has been, making it the final pedal msg
+        self.assertEqual(
+            _pedal_states(_get_midi_dict(10).remove_redundant_pedals()), []
+        )
+        self.assertEqual(
+            _pedal_states(_get_midi_dict(35).remove_redundant_pedals()),
+            [(1, 0, 1), (1, 30, 0), (0, 40, 0)],
+        )
+
+    def test_dict_to_midi_nested_notes(self) -> None:
+        def _get_note_off_ticks(note_msgs: list[NoteMessage]) -> list[int]:
+            mid = dict_to_midi(_msg_dict(note_msgs=note_msgs, pedal_msgs=[]))
+            note_off_ticks = []
+            tick = 0
+            for msg in mid.tracks[0]:
+                tick += msg.time
+                if msg.type == "note_on" and msg.velocity == 0:
+                    note_off_ticks.append(tick)
+
+            return note_off_ticks
+
+        # A same-pitch note nested inside another keeps both note-offs
+        self.assertEqual(
+            _get_note_off_ticks([_note_msg(60, 0, 100), _note_msg(60, 20, 50)]),
+            [50, 100],
+        )
+        # If it ends after the outer note, the outer note-off is skipped
+        self.assertEqual(
+            _get_note_off_ticks(
+                [_note_msg(60, 0, 100), _note_msg(60, 50, 150)]
+            ),
+            [150],
+        )